@@ -1,22 +1,28 @@
+from array import array
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import islice
 import math
-from typing import Literal, TypedDict
+import re
+from string import Template
+from typing import NamedTuple, TypedDict
 
 from nicegui import ui
 
 from virtual_memory import *
 
 # %% 工具函数 %% #
-unit_table = {0: '字节', 1: 'KB', 2: 'MB', 3: 'GB', 4: 'TB', 5: 'PB', 6: 'EB', 7: 'ZB', 8: 'YB'}
+MODE_CN = {"R": "读", "W": "写"} # 访问操作的显示名
+BOOL_CN = ("否", "是")          # 以布尔值为下标取显示名
+HEX_RE = re.compile(r"(?:0[xX])?[0-9a-fA-F]+") # 十六进制数字，可带 0x 前缀
+UNIT_TABLE = ('字节', 'KB', 'MB', 'GB', 'TB', 'PB', 'EB', 'ZB', 'YB') # 第 i 项为 1024^i 的单位
+@lru_cache(maxsize=256)
 def show_data_size(size: int):
   """将空间大小转换为为带单位的字符串"""
-  base = 0
-  while size % 1024 == 0:
-    size //= 1024
-    base += 1
-  if base > 8:
-    size <<= (base - 8) * 10
-    base = 8
-  return f"{size} {unit_table[base]}"
+  if size == 0:
+    return f"0 {UNIT_TABLE[0]}"
+  base = min(((size & -size).bit_length() - 1) // 10, 8) # 1024 = 2^10，由末尾 0 的个数得到单位
+  return f"{size >> (base * 10)} {UNIT_TABLE[base]}"
 
 # %% 参数 %% #
 class Parameters(TypedDict):
@@ -40,6 +46,139 @@ def reset_parameters(params: Parameters):
 params = Parameters() # type: ignore
 reset_parameters(params)
 
+# %% 地址格式 %% #
+@dataclass(frozen=True)
+class AddrGeometry:
+  """各地址字段的位数，只依赖于参数，每次初始化模拟器时计算一次"""
+  virt_addr_width: int # 虚地址位数
+  page_addr_width: int # 页内地址位数
+  phys_addr_width: int # 实地址位数
+  block_width: int     # 块内地址位数
+  set_width: int       # 组号位数
+  tag_width: int       # 标记位数
+  virt_binfmt: str     # 虚地址的二进制格式说明符
+  phys_binfmt: str     # 实地址的二进制格式说明符
+
+def compute_addr_geometry(params: Parameters, physical_size: int):
+  """由参数计算地址格式（各大小均为 2 的幂，用 bit_length 代替 log2）"""
+  phys_addr_width = physical_size.bit_length() - 1
+  block_width = params["block_size"].bit_length() - 1
+  set_width = params["cache_set_count"].bit_length() - 1
+  return AddrGeometry(
+    virt_addr_width=params["virtual_mem_addr_width"],
+    page_addr_width=params["page_size"].bit_length() - 1,
+    phys_addr_width=phys_addr_width,
+    block_width=block_width,
+    set_width=set_width,
+    tag_width=phys_addr_width - block_width - set_width,
+    virt_binfmt=f"0{params['virtual_mem_addr_width']}b",
+    phys_binfmt=f"0{phys_addr_width}b"
+  )
+
+DIGIT_CELL_OPEN = "<td class='w-4 text-center'>"
+def digit_cells(bits: str):
+  """将二进制串的每一位转换为一个表格单元"""
+  return DIGIT_CELL_OPEN + ("</td>" + DIGIT_CELL_OPEN).join(bits) + "</td>"
+
+# 虚地址到实地址的变换。位数字段由 specialize_addr_templates 预先代入，
+# 每次刷新只需填充 $digits_virt、$digits_phys、$vpn 与 $page_addr
+VIRT_ADDR_TEMPLATE = Template("""
+  <table class="border-separate">
+    <tr>
+      <td class='font-bold pr-1'>虚地址</td>
+      $digits_virt
+    </tr>
+    <tr class="text-xs text-center">
+      <td></td>
+      <td class="border-black border-l border-b">$virt_msb</td>
+      <td class="border-black border-b"
+          colspan="$vpn_colspan">
+        虚页号 = $vpn
+      </td>
+      <td class="border-black border-b border-r">$page_addr_width</td>
+      <td class="border-black border-l border-b">$page_msb</td>
+      <td class="border-black border-b" colspan="$page_colspan">
+        页内地址 = $page_addr
+      </td>
+      <td class="border-black border-b border-r">0</td>
+    </tr>
+    <tr class="text-xs text-center">
+      <td colspan="$phys_indent_1"></td>
+      <td class="border-black border-l border-t">$phys_msb</td>
+      <td class="border-black border-t text-center"
+          colspan="$ppn_colspan">
+        实页号
+      </td>
+      <td class="border-black border-t border-r">$page_addr_width</td>
+      <td class="border-black border-l border-t">$page_msb</td>
+      <td class="border-black border-t text-center" colspan="$page_colspan">
+        页内地址 = $page_addr
+      </td>
+      <td class="border-black border-t border-r">0</td>
+    </tr>
+    <tr>
+      <td class='font-bold pr-1'>实地址</td>
+      <td colspan="$phys_indent"></td>
+      $digits_phys
+    </tr>
+  </table>
+""")
+
+# 实地址在 Cache 中的划分，每次刷新只需填充 $digits_phys
+CACHE_ADDR_TEMPLATE = Template("""
+  <table class="border-separate">
+    <tr>
+      <td class='font-bold pr-1'>实地址</td>
+      $digits_phys
+    </tr>
+    <tr class="text-xs text-center">
+      <td></td>
+      <td class="border-black border-l border-b">$phys_msb</td>
+      <td class="border-black border-b text-center"
+          colspan="$tag_colspan">
+        标记
+      </td>
+      <td class="border-black border-b border-r">$set_lsb_1</td>
+      <td class="border-black border-l border-b">$set_msb</td>
+      <td class="border-black border-b text-center"
+          colspan="$set_colspan">
+        组号
+      </td>
+      <td class="border-black border-b border-r">$block_width</td>
+      <td class="border-black border-l border-b">$block_msb</td>
+      <td class="border-black border-b text-center" colspan="$block_colspan">
+        块内地址
+      </td>
+      <td class="border-black border-b border-r">0</td>
+    </tr>
+  </table>
+""")
+
+def specialize_addr_templates(g: AddrGeometry):
+  """代入只依赖参数的位数字段，返回 (虚实地址变换模板, Cache 地址划分模板)"""
+  virt = VIRT_ADDR_TEMPLATE.safe_substitute(
+    page_addr_width=g.page_addr_width,
+    virt_msb=g.virt_addr_width - 1,
+    vpn_colspan=g.virt_addr_width - g.page_addr_width - 2,
+    page_msb=g.page_addr_width - 1,
+    page_colspan=g.page_addr_width - 2,
+    phys_indent=g.virt_addr_width - g.phys_addr_width,
+    phys_indent_1=g.virt_addr_width - g.phys_addr_width + 1,
+    phys_msb=g.phys_addr_width - 1,
+    ppn_colspan=g.phys_addr_width - g.page_addr_width - 2
+  )
+  cache = CACHE_ADDR_TEMPLATE.safe_substitute(
+    phys_msb=g.phys_addr_width - 1,
+    tag_colspan=g.tag_width - 2,
+    set_lsb_1=g.set_width + g.block_width,
+    set_msb=g.set_width + g.block_width - 1,
+    set_colspan=g.set_width - 2,
+    block_width=g.block_width,
+    block_msb=g.block_width - 1,
+    block_colspan=g.block_width - 2
+  )
+  return (Template(virt), Template(cache))
+
 # %% 模拟器 %% #
 class LogPrinter(Printer):
   def __init__(self, log: ui.log):
@@ -54,56 +193,112 @@ class LogPrinter(Printer):
     self.log.push(sep.join(str(x) for x in values))
 
 def initialize_sim(params):
-  global physical_mem, cache, virtual_mem, tlb
+  global physical_mem, cache, virtual_mem, tlb, geometry, last_xlat
+  global virt_addr_tmpl, cache_addr_tmpl
   cache_printer = LogPrinter(log_cache)
   physical_mem = PhysicalMemory(
     size=params["physical_block_count"] * params["block_size"],
     block_size=params["block_size"],
-    printer=cache_printer
+    printer=cache_printer,
+    debug=True
   )
   cache = SetAssocCache(
     physical=physical_mem,
     size=params["cache_set_count"] * params["associativity"] * params["block_size"],
     associativity=params["associativity"],
-    printer=cache_printer
+    printer=cache_printer,
+    debug=True
   )
   virtual_mem = VirtualMemory(
     main_mem=cache,
     size=1 << params["virtual_mem_addr_width"],
     page_size=params["page_size"],
-    printer=LogPrinter(log_page_table)
+    printer=LogPrinter(log_page_table),
+    debug=True
   )
   tlb = FullyAssocTLB(
     virtual_mem=virtual_mem,
     size=params["tlb_line_count"],
-    printer=LogPrinter(log_tlb)
+    printer=LogPrinter(log_tlb),
+    debug=True
   )
+  geometry = compute_addr_geometry(params, physical_mem.size)
+  (virt_addr_tmpl, cache_addr_tmpl) = specialize_addr_templates(geometry)
+  last_xlat = translate(0)
 
 # %% 访问列表 %% #
 access_index = -1
-access_list = list[tuple[Literal['R', 'W'], int]]()
-access_list_line_list = list[tuple[ui.label, ui.label]]()
+highlighted_index = -1 # 当前高亮的行号
+# 访问列表按列存储：操作（0 为读，1 为写）与地址分别存放在紧凑的定长数组中
+access_modes = array('B')
+access_addrs = array('Q')
+access_list_rows = list[ui.row]()
 
 # %% 访问 %% #
-def access():
-  global access_index
-  if access_index + 1 >= len(access_list):
+class Translation(NamedTuple):
+  """一次访问的地址变换结果，供两个地址格式视图共用"""
+  addr: int      # 虚地址
+  vpn: int       # 虚页号
+  page_addr: int # 页内地址
+  phys_addr: int # 实地址，虚页不在主存中时为 0
+  hit: bool      # 虚页是否在主存中
+
+def translate(addr: int):
+  phys_addr = virtual_mem.translate(addr)
+  return Translation(
+    addr=addr,
+    vpn=addr // virtual_mem.page_size,
+    page_addr=addr % virtual_mem.page_size,
+    phys_addr=0 if phys_addr is None else phys_addr,
+    hit=phys_addr is not None
+  )
+
+def access(ui_update: bool = True):
+  """执行下一个访问操作
+
+  :param ui_update: 是否更新高亮并将各视图标记为待刷新（由调用者通过 flush_updates 刷新）。
+    连续执行时只需在最后一次访问后刷新，未刷新期间的修改会累积到下一次刷新中
+  """
+  global access_index, highlighted_index, last_xlat
+  if access_index + 1 >= len(access_addrs):
     ui.notify("已经执行到操作列表末尾，请先添加访问操作！")
     return
-  if access_index >= 0:
-    for label in access_list_line_list[access_index]:
-      label.classes(remove="bg-yellow")
   access_index += 1
-  mode, addr = access_list[access_index]
-  if mode == 'R':
-    tlb.read(addr)
-  else:
+  addr = access_addrs[access_index]
+  if access_modes[access_index]:
     tlb.write(addr)
-  update_tlb_table()
-  update_page_table()
-  update_cache_table()
-  for label in access_list_line_list[access_index]:
-    label.classes("bg-yellow")
+  else:
+    tlb.read(addr)
+  if not ui_update:
+    return
+  last_xlat = translate(addr)
+  pending_updates.update(ALL_VIEWS)
+  if highlighted_index >= 0:
+    access_list_rows[highlighted_index].classes(remove="bg-yellow")
+  access_list_rows[access_index].classes("bg-yellow")
+  highlighted_index = access_index
+
+# %% 界面刷新 %% #
+ALL_VIEWS = ("tlb", "page_table", "cache", "addr")
+pending_updates = set[str]() # 待刷新的视图，在事件处理结束时由 flush_updates 统一刷新
+
+def flush_updates(full: bool = False):
+  """刷新所有待刷新的视图，每个视图只刷新一次
+
+  :param full: 是否完全重建所有视图，初始化模拟器后使用
+  """
+  if full:
+    pending_updates.update(ALL_VIEWS)
+  if "tlb" in pending_updates:
+    update_tlb_table(full)
+  if "page_table" in pending_updates:
+    update_page_table(full)
+  if "cache" in pending_updates:
+    update_cache_table(full)
+  if "addr" in pending_updates:
+    update_virt_addr_transform()
+    update_cache_addr_comp()
+  pending_updates.clear()
 
 with ui.stepper() as stepper:
   stepper.classes("m-auto")
@@ -132,26 +327,26 @@ with ui.stepper() as stepper:
       )
       show_physical_mem_size.disable()
       
-      def show_addr_width_str():
-        block_no = int(math.ceil(math.log2(params["physical_block_count"])))
-        block_addr = int(math.log2(params["block_size"]))
+      @lru_cache(maxsize=256)
+      def show_addr_width_str(physical_block_count: int, block_size: int):
+        block_no = int(math.ceil(math.log2(physical_block_count)))
+        block_addr = int(math.log2(block_size))
         return f"{block_no + block_addr} = {block_no} + {block_addr}"
       show_addr_width = ui.input("物理地址位数 = 块号 + 块内地址")
       show_addr_width.bind_value_from(
         params,
         "physical_block_count",
-        lambda _: show_addr_width_str()
+        lambda _: show_addr_width_str(params["physical_block_count"], params["block_size"])
       )
       show_addr_width.disable()
       
       # %% Cache 参数 %% #
       ui.label("Cache 参数").classes("col-span-2 font-bold text-lg")
             
-      input_cache_set_count = ui.number(
-        "Cache 组数",
-        min=1, step=1,
-        format="%d"
-      ).bind_value(params, "cache_set_count", forward=int)
+      input_cache_set_count = ui.select(
+        [1 << i for i in range(13)],
+        label="Cache 组数"
+      ).bind_value(params, "cache_set_count")
       
       input_associativity = ui.select(
         {1: "直接映射", 2: "2 路组相联", 4: "4 路组相联", 8: "8 路组相联"},
@@ -179,7 +374,7 @@ with ui.stepper() as stepper:
       
       input_virtual_mem_addr_width = ui.number(
         "虚拟地址位数",
-        min=13, step=1,
+        min=13, max=64, step=1,
         format="%d"
       ).bind_value(params, "virtual_mem_addr_width", forward=int)
       
@@ -207,11 +402,7 @@ with ui.stepper() as stepper:
       ui.button("开始模拟", on_click=lambda _: (
         stepper.next(),
         initialize_sim(params),
-        update_tlb_table(),
-        update_page_table(),
-        update_cache_table(),
-        update_virt_addr_transform(),
-        update_cache_addr_comp()
+        flush_updates(full=True)
       ))
       ui.button("重置参数", on_click=lambda _: reset_parameters(params)).props('flat')
   with ui.step("执行模拟"):
@@ -222,11 +413,7 @@ with ui.stepper() as stepper:
           # %% 访问顺序 %% #
           ui.label("访问顺序").classes("col-span-2 font-bold text-lg")
           with ui.card().classes("h-64"):
-            show_access_list = (
-              ui.grid()
-              .classes("w-full gap-0 overflow-y-scroll")
-              .style("grid-template-columns: min-content auto;")
-            )
+            show_access_list = ui.column().classes("w-full gap-0 overflow-y-scroll")
           with ui.row(wrap=False):
             access_list_line = {
               "mode": "R",
@@ -234,41 +421,50 @@ with ui.stepper() as stepper:
               "validate": True
             }
             input_access_mode = ui.select(
-              {"R": "读", "W": "写"},
+              MODE_CN,
               label="操作",
               value="R"
             ).classes("w-20")
             input_access_mode.bind_value_to(access_list_line, "mode")
             def parse_hex_number(x):
-              try:
-                access_list_line["address"] = int(x, base=16)
-                access_list_line["validate"] = True
-              except ValueError:
+              if HEX_RE.fullmatch(x) is None: # 先用正则过滤，避免在非法输入上抛出异常
                 access_list_line["validate"] = False
+                return
+              addr = int(x, base=16)
+              access_list_line["address"] = addr
+              access_list_line["validate"] = 0 <= addr < 1 << 64 # 地址以 64 位无符号整数存储
             def validate_hex_number(x):
-              try: int(x, base=16)
-              except ValueError: return False
-              return True
+              return HEX_RE.fullmatch(x) is not None
+            def validate_addr_range(x):
+              # 非十六进制数字的输入由上一条规则报错，这里只检查范围
+              return HEX_RE.fullmatch(x) is None or int(x, base=16) < 1 << 64
             input_access_addr = ui.input(
               "地址",
               value="0",
               on_change=lambda e: parse_hex_number(e.value),
-              validation={"请输入十六进制数字": validate_hex_number}
+              validation={
+                "请输入十六进制数字": validate_hex_number,
+                "地址不可超过 64 位": validate_addr_range
+              }
             )
           with ui.row(wrap=False):
             def access_list_append():
-              access_list.append((access_list_line["mode"], access_list_line["address"]))
+              access_modes.append(access_list_line["mode"] == "W")
+              access_addrs.append(access_list_line["address"])
               with show_access_list:
-                access_list_line_list.append((
-                  ui.label({"R": "读", "W": "写"}[access_list_line["mode"]]).classes("pr-2"),
+                with ui.row(wrap=False).classes("w-full gap-0") as row:
+                  ui.label(MODE_CN[access_list_line["mode"]]).classes("pr-2")
                   ui.label(f"{access_list_line['address']:#x}")
-                ))
+                access_list_rows.append(row)
             def access_list_clear():
-              global access_index
+              global access_index, highlighted_index, last_xlat
               access_index = -1
-              access_list.clear()
+              highlighted_index = -1
+              last_xlat = translate(0)
+              del access_modes[:]
+              del access_addrs[:]
               show_access_list.clear()
-              access_list_line_list.clear()
+              access_list_rows.clear()
               
               # new added, to clear the log info on the right side
               log_tlb.clear()
@@ -288,22 +484,17 @@ with ui.stepper() as stepper:
           with ui.row():
             ui.button("单步执行", on_click=lambda _: (
               access(),
-              update_virt_addr_transform(),
-              update_cache_addr_comp()
+              flush_updates()
             ))
             ui.button("连续执行", on_click=lambda _: (
-              [access() for _ in range(len(access_list) - access_index - 1)],
-              update_virt_addr_transform(),
-              update_cache_addr_comp()
+              [access(ui_update=False) for _ in range(len(access_addrs) - access_index - 2)],
+              access(),
+              flush_updates()
             ))
             ui.button("重置模拟", on_click=lambda _: (
               access_list_clear(),
               initialize_sim(params),
-              update_tlb_table(),
-              update_page_table(),
-              update_cache_table(),
-              update_virt_addr_transform(),
-              update_cache_addr_comp()
+              flush_updates(full=True)
             )).props('flat')
             ui.button("重设参数", on_click=stepper.previous).props('flat')
 
@@ -312,62 +503,12 @@ with ui.stepper() as stepper:
         with ui.timeline_entry(title="TLB"):
           show_virt_addr_transform = ui.html()
           def update_virt_addr_transform():
-            addr = 0
-            if 0 <= access_index < len(access_list):
-              _, addr = access_list[access_index]
-            addr_bin = bin(addr)[2:].zfill(params["virtual_mem_addr_width"])
-            virt_addr_width = params["virtual_mem_addr_width"]
-            page_addr_width = int(math.log2(params["page_size"]))
-            phys_addr_width = int(math.log2(physical_mem.size))
-            page_addr = addr % params["page_size"]
-            if addr // params["page_size"] in virtual_mem.page_table:
-              phys_page = virtual_mem.page_table[addr // params["page_size"]].physical
-              phys_addr = phys_page * params["page_size"] + page_addr
-            else:
-              phys_page = 0
-              phys_addr = 0
-            phys_addr_bin = bin(phys_addr)[2:].zfill(phys_addr_width)
-            show_virt_addr_transform.set_content(f"""
-              <table class="border-separate">
-                <tr>
-                  <td class='font-bold pr-1'>虚地址</td>
-                  {"".join(f"<td class='w-4 text-center'>{d}</td>" for d in addr_bin)}
-                </tr>
-                <tr class="text-xs text-center">
-                  <td></td>
-                  <td class="border-black border-l border-b">{virt_addr_width - 1}</td>
-                  <td class="border-black border-b"
-                      colspan="{virt_addr_width - page_addr_width - 2}">
-                    虚页号 = {addr // params["page_size"]:#x}
-                  </td>
-                  <td class="border-black border-b border-r">{page_addr_width}</td>
-                  <td class="border-black border-l border-b">{page_addr_width - 1}</td>
-                  <td class="border-black border-b" colspan="{page_addr_width - 2}">
-                    页内地址 = {page_addr:#x}
-                  </td>
-                  <td class="border-black border-b border-r">0</td>
-                </tr>
-                <tr class="text-xs text-center">
-                  <td colspan="{virt_addr_width - phys_addr_width + 1}"></td>
-                  <td class="border-black border-l border-t">{phys_addr_width - 1}</td>
-                  <td class="border-black border-t text-center"
-                      colspan="{phys_addr_width - page_addr_width - 2}">
-                    实页号
-                  </td>
-                  <td class="border-black border-t border-r">{page_addr_width}</td>
-                  <td class="border-black border-l border-t">{page_addr_width - 1}</td>
-                  <td class="border-black border-t text-center" colspan="{page_addr_width - 2}">
-                    页内地址 = {page_addr:#x}
-                  </td>
-                  <td class="border-black border-t border-r">0</td>
-                </tr>
-                <tr>
-                  <td class='font-bold pr-1'>实地址</td>
-                  <td colspan="{virt_addr_width - phys_addr_width}"></td>
-                  {"".join(f"<td class='w-4 text-center'>{d}</td>" for d in phys_addr_bin)}
-                </tr>
-              </table>
-            """)
+            show_virt_addr_transform.set_content(virt_addr_tmpl.substitute(
+              digits_virt=digit_cells(format(last_xlat.addr, geometry.virt_binfmt)),
+              digits_phys=digit_cells(format(last_xlat.phys_addr, geometry.phys_binfmt)),
+              vpn=f"{last_xlat.vpn:#x}",
+              page_addr=f"{last_xlat.page_addr:#x}"
+            ))
           with ui.row(wrap=False):
             columns = [
               {"name": "id", "label": "行号", "field": "id"},
@@ -377,21 +518,27 @@ with ui.stepper() as stepper:
               {"name": "virtual", "label": "虚页号", "field": "virtual"},
               {"name": "physical", "label": "实页号", "field": "physical"}
             ]
-            show_tlb_table = ui.table(columns, []).classes("h-64")
-            def update_tlb_table():
-              show_tlb_table.rows = [
-                dict(
-                  id=i,
-                  valid=["否", "是"][line.valid],
-                  **{
-                    "dirty": ["否", "是"][line.dirty],
-                    "dirty_dirty": ["否", "是"][line.dirty_dirty],
-                    "virtual": f"{line.virtual:#x}",
-                    "physical": f"{line.physical:#x}"
-                  } if line.valid else dict()
-                )
-                for i, line in enumerate(tlb.table)
-              ]
+            show_tlb_table = ui.table(columns, []).classes("h-64").props("virtual-scroll")
+            def tlb_row(i: int, line: FullyAssocTLB.Line):
+              return dict(
+                id=i,
+                valid=BOOL_CN[line.valid],
+                **{
+                  "dirty": BOOL_CN[line.dirty],
+                  "dirty_dirty": BOOL_CN[line.dirty_dirty],
+                  "virtual": f"{line.virtual:#x}",
+                  "physical": f"{line.physical:#x}"
+                } if line.valid else dict()
+              )
+            def update_tlb_table(full: bool = False):
+              """刷新 TLB 表格，默认只重建被修改过的行"""
+              if full:
+                show_tlb_table.rows = [tlb_row(i, line) for i, line in enumerate(tlb.table)]
+              elif tlb.modified_lines:
+                for i in tlb.modified_lines:
+                  show_tlb_table.rows[i] = tlb_row(i, tlb.table[i])
+                show_tlb_table.update()
+              tlb.modified_lines.clear()
             log_tlb = ui.log().classes("self-stretch w-64 whitespace-pre-line font-s")
         # %% 页表 %% #
         with ui.timeline_entry(title="页表"):
@@ -399,7 +546,7 @@ with ui.stepper() as stepper:
             "随机化页表",
             on_click=lambda _: (
               virtual_mem.randomize_page_table(0.5),
-              update_page_table()
+              update_page_table(full=True)
             )
           )
           with ui.row(wrap=False):
@@ -409,83 +556,62 @@ with ui.stepper() as stepper:
               {"name": "dirty", "label": "脏", "field": "dirty"},
               {"name": "physical", "label": "实页号", "field": "physical"}
             ]
-            show_page_table = ui.table(columns, []).classes("h-64")
-            def update_page_table():
-              sorted_keys = sorted(virtual_mem.page_table.keys())
+            show_page_table = ui.table(columns, []).classes("h-64").props("virtual-scroll")
+            PAGE_TABLE_VISIBLE_PAGES = 128 # 表格高度有限，最多显示的已装入虚页数
+            page_table_row_index = dict[int, int]() # 虚页号 -> 表格行号
+            page_table_visible_end = math.inf # 表格被截断时为最后显示的虚页号 + 1
+            def page_table_row(id: int):
+              if id < 0:
+                return {"id": "...", "valid": "否"}
+              return {
+                "id": f"{id:#x}",
+                "valid": "是",
+                "dirty": BOOL_CN[virtual_mem.page_table[id].dirty],
+                "physical": f"{virtual_mem.page_table[id].physical:#x}"
+              }
+            def update_page_table(full: bool = False):
+              """刷新页表表格，页表行只有脏位变化时原地更新，显示范围内有装入或写回时重建"""
+              global page_table_visible_end
+              modified = virtual_mem.modified_pages
+              if not full and not any(
+                page not in virtual_mem.page_table
+                if page in page_table_row_index else
+                page in virtual_mem.page_table and page < page_table_visible_end
+                for page in modified
+              ):
+                rows = show_page_table.rows
+                for page in modified:
+                  if page in page_table_row_index:
+                    rows[page_table_row_index[page]] = page_table_row(page)
+                if modified:
+                  show_page_table.update()
+                modified.clear()
+                return
+              modified.clear()
               ids = []
-              if len(sorted_keys) > 0:
-                if sorted_keys[0] != 0:
-                  ids.append(-1)
-                ids.append(sorted_keys[0])
-              for i, id in enumerate(sorted_keys[1:]):
-                if id - sorted_keys[i] != 1:
+              last = -1
+              for id in islice(virtual_mem.resident_pages, PAGE_TABLE_VISIBLE_PAGES):
+                if id != last + 1:
                   ids.append(-1)
                 ids.append(id)
-              if len(sorted_keys) > 0:
-                if sorted_keys[-1] != virtual_mem.size // virtual_mem.page_size - 1:
-                  ids.append(-1)
-              if len(sorted_keys) == 0:
+                last = id
+              if last != virtual_mem.size // virtual_mem.page_size - 1:
                 ids.append(-1)
-              show_page_table.rows = [
-                {
-                  "id": f"{id:#x}",
-                  "valid": "是",
-                  "dirty": ["否", "是"][virtual_mem.page_table[id].dirty],
-                  "physical": f"{virtual_mem.page_table[id].physical:#x}"
-                } if id >= 0 else {
-                  "id": "...",
-                  "valid": "否"
-                }
-                for id in ids
-              ]
+              if len(virtual_mem.resident_pages) > PAGE_TABLE_VISIBLE_PAGES:
+                page_table_visible_end = last + 1
+              else:
+                page_table_visible_end = math.inf
+              show_page_table.rows = [page_table_row(id) for id in ids]
+              page_table_row_index.clear()
+              page_table_row_index.update((id, i) for i, id in enumerate(ids) if id >= 0)
             log_page_table = ui.log().classes("self-stretch w-64 whitespace-pre-line font-s")
         # %% Cache %% #
         with ui.timeline_entry(title="Cache"):
           show_cache_addr_comp = ui.html()
           def update_cache_addr_comp():
-            addr = 0
-            if 0 <= access_index < len(access_list):
-              _, addr = access_list[access_index]
-            page_addr = addr % params["page_size"]
-            phys_addr_width = int(math.log2(physical_mem.size))
-            if addr // params["page_size"] in virtual_mem.page_table:
-              phys_page = virtual_mem.page_table[addr // params["page_size"]].physical
-              phys_addr = phys_page * params["page_size"] + page_addr
-            else:
-              phys_page = 0
-              phys_addr = 0
-            phys_addr_bin = bin(phys_addr)[2:].zfill(phys_addr_width)
-            block_width = int(math.log2(params["block_size"]))
-            set_width = int(math.log2(params["cache_set_count"]))
-            tag_width = phys_addr_width - block_width - set_width
-            show_cache_addr_comp.set_content(f"""
-              <table class="border-separate">
-                <tr>
-                  <td class='font-bold pr-1'>实地址</td>
-                  {"".join(f"<td class='w-4 text-center'>{d}</td>" for d in phys_addr_bin)}
-                </tr>
-                <tr class="text-xs text-center">
-                  <td></td>
-                  <td class="border-black border-l border-b">{phys_addr_width - 1}</td>
-                  <td class="border-black border-b text-center"
-                      colspan="{tag_width - 2}">
-                    标记
-                  </td>
-                  <td class="border-black border-b border-r">{set_width + block_width}</td>
-                  <td class="border-black border-l border-b">{set_width + block_width - 1}</td>
-                  <td class="border-black border-b text-center"
-                      colspan="{set_width - 2}">
-                    组号
-                  </td>
-                  <td class="border-black border-b border-r">{block_width}</td>
-                  <td class="border-black border-l border-b">{block_width - 1}</td>
-                  <td class="border-black border-b text-center" colspan="{block_width - 2}">
-                    块内地址
-                  </td>
-                  <td class="border-black border-b border-r">0</td>
-                </tr>
-              </table>
-            """)
+            show_cache_addr_comp.set_content(cache_addr_tmpl.substitute(
+              digits_phys=digit_cells(format(last_xlat.phys_addr, geometry.phys_binfmt))
+            ))
           with ui.row(wrap=False):
             columns = [
               {"name": "id", "label": "组号", "field": "id"},
@@ -493,24 +619,33 @@ with ui.stepper() as stepper:
               {"name": "valid", "label": "有效", "field": "valid"},
               {"name": "dirty", "label": "脏", "field": "dirty"},
               {"name": "tag", "label": "标记", "field": "tag"},
-              {"name": "timer", "label": "计时器", "field": "timer"}
+              {"name": "timer", "label": "时间戳", "field": "timer"}
             ]
-            show_cache_table = ui.table(columns, []).classes("h-64")
-            def update_cache_table():
-              show_cache_table.rows = [
-                dict(
-                  id=idx,
-                  way=way,
-                  valid=["否", "是"][line.valid],
-                  **{
-                    "dirty": ["否", "是"][line.dirty],
-                    "tag": f"{line.tag:#x}",
-                    "timer": f"{line.timer}"
-                  } if line.valid else dict()
-                )
-                for idx, set_ in enumerate(cache.data)
-                for way, line in enumerate(set_)
-              ]
+            show_cache_table = ui.table(columns, []).classes("h-64").props("virtual-scroll")
+            def cache_row(i: int):
+              (idx, way) = divmod(i, cache.associativity)
+              return dict(
+                id=idx,
+                way=way,
+                valid=BOOL_CN[cache.valid[i]],
+                **{
+                  "dirty": BOOL_CN[cache.dirty[i]],
+                  "tag": f"{cache.tags[i]:#x}",
+                  "timer": f"{cache.timer[i]}"
+                } if cache.valid[i] else dict()
+              )
+            def update_cache_table(full: bool = False):
+              """刷新 Cache 表格，默认只重建被修改过的组"""
+              if full:
+                show_cache_table.rows = [cache_row(i) for i in range(len(cache.tags))]
+              elif cache.modified_sets:
+                rows = show_cache_table.rows
+                for idx in cache.modified_sets:
+                  base = idx * cache.associativity
+                  for i in range(base, base + cache.associativity):
+                    rows[i] = cache_row(i)
+                show_cache_table.update()
+              cache.modified_sets.clear()
             log_cache = ui.log().classes("self-stretch w-64 whitespace-pre-line font-s")
 
 ui.run(
@@ -1,8 +1,10 @@
-from collections import deque
+from bisect import bisect_left, insort
 from dataclasses import dataclass
-import math
+from functools import lru_cache
+from itertools import islice
 import random
-from typing import Protocol
+import types
+from typing import Callable, Iterable, Protocol
 
 class Printer(Protocol):
   def __call__(
@@ -24,159 +26,338 @@ class PrinterWithPrefix:
   ):
     print(self.prefix, *values, sep=sep, end=end)
 
+@dataclass(frozen=True)
+class SilentPrinter:
+  """不输出任何消息的输出器
+
+  以它构造的模拟器在热路径上跳过所有消息的格式化与输出，适合批量回放大量访问。
+  """
+
+  def __call__(
+    self,
+    *values: object,
+    sep: str | None = " ",
+    end: str | None = "\n"
+  ):
+    pass
+
+class LRUList:
+  """LRU 链表：按访问先后串起所有键的双向循环链表，访问、插入与删除均为 O(1)
+
+  键为 [0, capacity) 内的整数，前驱与后继以下标形式存放在两个预先分配的列表中，不为节点分配对象。
+  下标 capacity 处为哨兵，哨兵的后继即为最久未访问的键。
+  """
+
+  _prev: list[int] # 各键的前驱，不在链表中的键为 -1
+  _next: list[int] # 各键的后继，不在链表中的键为 -1
+  _head: int       # 哨兵的下标
+  _count: int      # 链表中的键数
+  _debug: bool     # 是否在每次操作时检查参数
+
+  def __init__(self, capacity: int, debug: bool = False):
+    """
+    :param capacity: 键的上界（不含）
+    :param debug: 是否在每次操作时检查参数
+    """
+    self._prev = [-1] * (capacity + 1)
+    self._next = [-1] * (capacity + 1)
+    self._head = capacity
+    self._prev[capacity] = self._next[capacity] = capacity
+    self._count = 0
+    self._debug = debug
+
+  def __len__(self):
+    return self._count
+
+  def __contains__(self, key: int):
+    return self._next[key] >= 0
+
+  def oldest(self):
+    """最久未访问的键"""
+    if self._debug:
+      assert self._count, "LRU 链表为空"
+    return self._next[self._head]
+
+  def push(self, key: int):
+    """插入一个新键，作为最近访问的键"""
+    if self._debug:
+      assert 0 <= key < self._head, "键不可越界"
+      assert self._next[key] < 0, "键已在 LRU 链表中"
+    (prv, nxt, head) = (self._prev, self._next, self._head)
+    tail = prv[head]
+    prv[key] = tail
+    nxt[key] = head
+    nxt[tail] = prv[head] = key
+    self._count += 1
+
+  def touch(self, key: int):
+    """将一个键移到最近访问处"""
+    (prv, nxt, head) = (self._prev, self._next, self._head)
+    nxt[prv[key]] = nxt[key]
+    prv[nxt[key]] = prv[key]
+    tail = prv[head]
+    prv[key] = tail
+    nxt[key] = head
+    nxt[tail] = prv[head] = key
+
+  def remove(self, key: int):
+    """删除一个键"""
+    (prv, nxt) = (self._prev, self._next)
+    nxt[prv[key]] = nxt[key]
+    prv[nxt[key]] = prv[key]
+    prv[key] = nxt[key] = -1
+    self._count -= 1
+
 class PhysicalMemory:
   """物理内存"""
 
   size: int # 内存大小
   block_size: int # 块大小
   printer: Printer # 消息输出器
+  _verbose: bool # 是否输出消息，由构造时的 printer 决定
+  _debug: bool # 是否在每次访问时检查参数
   
   def __init__(
     self,
     size: int = 1 << 16,
     block_size: int = 32,
-    printer: Printer = print
+    printer: Printer = print,
+    debug: bool = False
   ):
     """
     :param size: 内存大小
     :param block_size: 块大小
+    :param debug: 是否在每次访问时检查参数
     """
     assert size % block_size == 0, "内存大小必须是块大小的整数倍"
     self.size = size
     self.block_size = block_size
     self.printer = printer
+    self._verbose = not isinstance(printer, SilentPrinter)
+    self._debug = debug
   
   def read(self, addr: int):
     """读一个内存地址，返回 True"""
-    assert addr >= 0 and addr < self.size, "物理内存地址不可越界"
-    self.printer(f"读物理内存块 {addr // self.block_size:#x}")
+    if self._debug:
+      assert addr >= 0 and addr < self.size, "物理内存地址不可越界"
+    if self._verbose:
+      self.printer(f"读物理内存块 {addr // self.block_size:#x}")
   
   def write(self, addr: int):
     """写一个内存地址，返回 True"""
-    assert addr >= 0 and addr < self.size, "物理内存地址不可越界"
-    self.printer(f"写物理内存块 {addr // self.block_size:#x}")
+    if self._debug:
+      assert addr >= 0 and addr < self.size, "物理内存地址不可越界"
+    if self._verbose:
+      self.printer(f"写物理内存块 {addr // self.block_size:#x}")
+
+  def write_many(self, addrs: list[int]):
+    """一次写一组内存地址，只检查一次边界并只输出一条消息"""
+    if not addrs:
+      return
+    if self._debug:
+      assert min(addrs) >= 0 and max(addrs) < self.size, "物理内存地址不可越界"
+    if self._verbose:
+      self.printer("写物理内存块 " + ", ".join(f"{addr // self.block_size:#x}" for addr in addrs))
+
+@lru_cache
+def _make_find_line(associativity: int):
+  """生成给定相联度下展开了组内循环的查找函数
+
+  生成的 _find_line(self, tag, base) 依次比较第 base 块起的 associativity 个块，
+  返回标记匹配的有效块的下标，不命中则返回 -1。相联度为 1 时即退化为一次比较。
+  """
+  src = ["def _find_line(self, tag, base):", "  (tags, valid) = (self.tags, self.valid)"]
+  for way in range(associativity):
+    i = f"base + {way}" if way else "base"
+    src.append(f"  if tags[{i}] == tag and valid[{i}]:")
+    src.append(f"    return {i}")
+  src.append("  return -1")
+  namespace = dict()
+  exec("\n".join(src), namespace)
+  return namespace["_find_line"]
 
 class SetAssocCache:
-  """组相联 cache"""
+  """组相联 cache
+  
+  目录表按字段拆成 tags、valid、dirty、timer 四个平行列表，第 idx 组第 way 块位于下标 idx * associativity + way。
+  """
   
-  @dataclass
-  class Line:
-    """cache 行
-    
-    :param tag: 标记
-    :param valid: 有效位
-    :param dirty: 脏位
-    :param timer: LRU 计时器
-    """
-    tag: int = 0                 # 标记
-    valid: bool = False          # 有效位
-    dirty: bool = False          # 脏位
-    timer: int = 0               # LRU 计时器
-
   physical: PhysicalMemory       # 物理内存
   size: int                      # 大小
   associativity: int             # 相联度
   block_size: int                # 块大小
-  data: list[list[Line]]         # 目录表
+  set_count: int                 # 组数
+  tags: list[int]                # 各块的标记
+  valid: list[bool]              # 各块的有效位
+  dirty: list[bool]              # 各块的脏位
+  timer: list[int]               # 各块的 LRU 时间戳，即最近一次访问的时刻
+  _valid_mask: list[int]         # 各组的有效位掩码，第 way 位表示组内第 way 块是否有效
+  _full_mask: int                # 组内所有块均有效时的掩码
+  _max_tag: int                  # 标记的上界（不含）
+  modified_sets: set[int]        # 自上次清空以来内容被修改的组号
+  _clock: int                    # 访问计数，单调递增，作为 LRU 时间戳
+  _transp_shift: int             # 标记在地址中的起始位
+  _transp_mask: int              # 组号与块内地址的掩码
+  _block_shift: int              # 组号在地址中的起始位
+  _block_mask: int               # 块内地址的掩码
+  _find_line: types.MethodType   # 按相联度生成的组内查找函数，见 _make_find_line
   printer: Printer
+  _verbose: bool                 # 是否输出消息，由构造时的 printer 决定
+  _debug: bool                   # 是否在每次访问时检查参数
   
   def __init__(
     self,
     physical: PhysicalMemory,
     size: int = 2 << 10,
     associativity: int = 1,
-    printer: Printer = print
+    printer: Printer = print,
+    debug: bool = False
   ):
     """
     :param physical: 物理内存
     :param size: cache 大小
     :param associativity: 相联度
+    :param debug: 是否在每次访问时检查参数
     """
     assert size % (associativity * physical.block_size) == 0, "cache 大小必须是相联度与块大小的乘积的整数倍"
+    transp_size = size // associativity # 每组在内存地址上算同一块，如同 Cache 大小减小一般
+    assert physical.block_size & (physical.block_size - 1) == 0, "块大小必须是 2 的幂"
+    assert associativity & (associativity - 1) == 0, "相联度必须是 2 的幂"
+    assert transp_size & (transp_size - 1) == 0, "cache 组数必须是 2 的幂"
     self.physical = physical
     self.size = size
     self.associativity = associativity
     self.block_size = physical.block_size
-    self.data = [
-      [self.Line() for _ in range(associativity)]
-      for _ in range(size // (associativity * self.block_size))
-    ]
+    self.set_count = size // (associativity * self.block_size)
+    nlines = self.set_count * associativity
+    self.tags = [0] * nlines
+    self.valid = [False] * nlines
+    self.dirty = [False] * nlines
+    self.timer = [0] * nlines
+    self._valid_mask = [0] * self.set_count
+    self._full_mask = (1 << associativity) - 1
+    self._max_tag = -(-physical.size // transp_size)
+    self.modified_sets = set()
+    self._clock = 0
+    self._transp_shift = transp_size.bit_length() - 1
+    self._transp_mask = transp_size - 1
+    self._block_shift = self.block_size.bit_length() - 1
+    self._block_mask = self.block_size - 1
+    self._find_line = types.MethodType(_make_find_line(associativity), self)
     self.printer = printer
+    self._verbose = not isinstance(printer, SilentPrinter)
+    self._debug = debug
   
   def _get_addr_info(self, addr: int):
     """由内存地址计算 (标记, cache 组号, 块内地址)"""
-    transp_size = self.size // self.associativity # 每组在内存地址上算同一块，如同 Cache 大小减小一般
-    tag = addr // transp_size
-    idx = (addr % transp_size) // self.block_size
-    block_addr = addr % transp_size % self.block_size
-    return (tag, idx, block_addr)
+    rem = addr & self._transp_mask
+    return (addr >> self._transp_shift, rem >> self._block_shift, rem & self._block_mask)
   
   def _get_addr(self, tag: int, idx: int, block_addr: int):
     """由 (标记, cache 组号, 块内地址) 计算内存地址"""
-    return tag * (self.size // self.associativity) + idx * self.block_size + block_addr
+    return (tag << self._transp_shift) | (idx << self._block_shift) | block_addr
   
   def _swap_in(self, tag: int, idx: int):
     """给定标记和 cache 组号，调入一个块，返回组内块号"""
-    assert tag >= 0 and tag < math.ceil(self.physical.size / self.size), "标记不可越界"
-    assert idx >= 0 and idx < len(self.data), "块号不可越界"
-    way = next((way for way in range(self.associativity) if not self.data[idx][way].valid), None)
-    if way is None:
-      self.printer("Cache 组已满，需要调出")
-      way = max(range(self.associativity), key=lambda way: self.data[idx][way].timer)
+    if self._debug:
+      assert tag >= 0 and tag < self._max_tag, "标记不可越界"
+      assert idx >= 0 and idx < self.set_count, "块号不可越界"
+    base = idx * self.associativity
+    free = ~self._valid_mask[idx] & self._full_mask
+    if free:
+      way = (free & -free).bit_length() - 1 # 编号最小的空闲块
+    else:
+      if self._verbose:
+        self.printer("Cache 组已满，需要调出")
+      stamps = self.timer[base:base + self.associativity]
+      way = stamps.index(min(stamps)) # 时间戳最小即最久未访问
       self._swap_out(idx, way)
-    line = self.data[idx][way]
     self.physical.read(self._get_addr(tag, idx, 0))
-    self.printer("从内存读取一个块")
-    line.tag = tag
-    line.valid = True
-    line.dirty = False
+    if self._verbose:
+      self.printer("从内存读取一个块")
+    self.tags[base + way] = tag
+    self.valid[base + way] = True
+    self.dirty[base + way] = False
+    self._valid_mask[idx] |= 1 << way
     return way
   
   def _swap_out(self, idx: int, way: int):
     """给定 cache 组号和组内块号，调出一个块"""
-    assert idx >= 0 and idx < len(self.data), "组号不可越界"
-    assert way >= 0 and way < self.associativity, "组内块号不可越界"
+    if self._debug:
+      assert idx >= 0 and idx < self.set_count, "组号不可越界"
+      assert way >= 0 and way < self.associativity, "组内块号不可越界"
     block = idx * self.associativity + way
-    line = self.data[idx][way]
-    assert line.valid, "只有当 cache 块有效时才能调出"
-    if line.dirty:
-      self.printer(f"cache 块 {block:#x} 为脏块，需要写回")
-      self.physical.write(self._get_addr(line.tag, idx, 0))
+    if self._debug:
+      assert self.valid[block], "只有当 cache 块有效时才能调出"
+    if self.dirty[block]:
+      if self._verbose:
+        self.printer(f"cache 块 {block:#x} 为脏块，需要写回")
+      self.physical.write(self._get_addr(self.tags[block], idx, 0))
     else:
-      self.printer(f"cache 块 {block:#x} 非脏块，无需写回")
-    line.valid = False
+      if self._verbose:
+        self.printer(f"cache 块 {block:#x} 非脏块，无需写回")
+    self.valid[block] = False
+    self._valid_mask[idx] &= ~(1 << way)
+    self.modified_sets.add(idx)
+  
+  def _access(self, addr: int, is_write: bool):
+    """读或写一个内存地址，返回是否命中
+
+    read 与 write 共用的热路径：地址划分直接展开，组内查找使用按相联度生成的 _find_line。
+    """
+    if self._debug:
+      assert addr >= 0 and addr < self.physical.size, "物理内存地址不可越界"
+    tag = addr >> self._transp_shift
+    idx = (addr & self._transp_mask) >> self._block_shift
+    base = idx * self.associativity
+    i = self._find_line(tag, base)
+    if i >= 0: # 命中
+      hit = True
+      if self._verbose:
+        self.printer("cache 命中，读取 cache 块")
+    else: # 不命中
+      hit = False
+      if self._verbose:
+        self.printer("cache 不命中，需要调入")
+      i = base + self._swap_in(tag, idx)
+    if is_write:
+      self.dirty[i] = True
+    self._clock += 1
+    self.timer[i] = self._clock
+    self.modified_sets.add(idx)
+    return hit
   
   def read(self, addr: int):
     """读一个内存地址，返回是否命中"""
-    assert addr >= 0 and addr < self.physical.size, "物理内存地址不可越界"
-    (tag, idx, block_addr) = self._get_addr_info(addr)
-    line = next((line for line in self.data[idx] if line.valid and line.tag == tag), None)
-    if line is not None: # 命中
-      self.printer("cache 命中，读取 cache 块")
-    else: # 不命中
-      self.printer("cache 不命中，需要调入")
-      way = self._swap_in(tag, idx)
-      line = self.data[idx][way]
-    line.timer = 0
-    for line in self.data[idx]: line.timer += 1
+    return self._access(addr, False)
   
   def write(self, addr: int):
     """写一个内存地址，返回是否命中
     
     写策略：写回法、按写分配
     """
-    assert addr >= 0 and addr < self.physical.size, "物理内存地址不可越界"
-    (tag, idx, block_addr) = self._get_addr_info(addr)
-    line = next((line for line in self.data[idx] if line.valid and line.tag == tag), None)
-    if line is not None: # 命中
-      self.printer("cache 命中，读取 cache 块")
-    else: # 不命中
-      self.printer("cache 不命中，需要调入")
-      way = self._swap_in(tag, idx)
-      line = self.data[idx][way]
-    line.dirty = True
-    line.timer = 0
-    for line in self.data[idx]: line.timer += 1
+    return self._access(addr, True)
+
+  def read_many(self, addrs: Iterable[int]):
+    """依次读一组内存地址，用于回放访问序列"""
+    access = self._access
+    for addr in addrs:
+      access(addr, False)
+
+  def write_many(self, addrs: Iterable[int]):
+    """依次写一组内存地址，用于回放访问序列"""
+    access = self._access
+    for addr in addrs:
+      access(addr, True)
+
+  def run(self, addrs: Iterable[int], is_write: Iterable[bool]):
+    """依次读写一组内存地址，返回命中次数
+
+    :param addrs: 内存地址序列
+    :param is_write: 与 addrs 一一对应，表示各次访问是否为写
+    """
+    access = self._access
+    return sum(access(addr, write) for addr, write in zip(addrs, is_write))
 
   def invalidate(self, begin: int, end: int):
     """将一段内存的 cache 无效化，即将对应的块全部调出
@@ -184,22 +365,38 @@ class SetAssocCache:
     :param begin: 内存地址范围开始
     :param end: 内存地址范围末尾
     """
-    for addr in range(begin - begin % self.block_size, end, self.block_size):
-      (tag, idx, _) = self._get_addr_info(addr)
-      way = next((
-        way for way in range(self.associativity)
-        if self.data[idx][way].valid and self.data[idx][way].tag == tag
-      ), None)
-      if way is not None:
-        self._swap_out(idx, way)
+    begin -= begin % self.block_size
+    if begin >= end:
+      return
+    # 相邻的块落在相邻的组中，组号到达末尾时回绕并使标记加一，因此只需计算一次地址划分
+    (tag, idx, _) = self._get_addr_info(begin)
+    count = 0
+    writebacks = list[int]() # 需要写回的脏块的内存地址，最后一并写回
+    for _ in range(-(-(end - begin) // self.block_size)):
+      block = self._find_line(tag, idx * self.associativity)
+      if block >= 0: # 就地调出，不逐块输出消息
+        way = block - idx * self.associativity
+        if self.dirty[block]:
+          writebacks.append(self._get_addr(tag, idx, 0))
+        self.valid[block] = False
+        self._valid_mask[idx] &= ~(1 << way)
+        self.modified_sets.add(idx)
+        count += 1
+      idx += 1
+      if idx == self.set_count:
+        idx = 0
+        tag += 1
+    if count and self._verbose:
+      self.printer(f"调出 {count} 个 cache 块，其中 {len(writebacks)} 个为脏块，需要写回")
+    self.physical.write_many(writebacks)
 
 class VirtualMemory:
   """虚拟内存空间
   
-  本模拟器不考虑辅存的情况，并且直接使用 Python 的集合类型处理了主存空间分配问题。
+  本模拟器不考虑辅存的情况，主存空间以空闲页框栈 free_frames 分配，从末尾取出与归还。
   """
   
-  @dataclass
+  @dataclass(slots=True)
   class Page:
     """页表中的一行（没有有效位，因为使用了字典模拟）
     
@@ -212,119 +409,216 @@ class VirtualMemory:
   main_mem: SetAssocCache             # 主存
   size: int                           # 虚拟地址空间大小
   page_size: int                      # 页面大小
+  _page_shift: int                    # 虚页号在地址中的起始位
+  _page_mask: int                     # 页内地址的掩码
   page_table: dict[int, Page]         # 页表（为了性能使用字典而非列表实现）
-  frame_set: set[int]                 # 空闲页框集
-  lru_queue: deque[int]               # LRU 算法的队列
+  resident_pages: list[int]           # 已装入的虚页号，始终保持有序
+  free_frames: list[int]              # 空闲页框栈，从末尾取出与归还
+  lru_list: LRUList                   # LRU 算法的链表，以页框号为键
+  _frame_page: list[int]              # 页框号 -> 装入其中的虚页号
+  _mru_page: int                      # 处于 LRU 链表最近访问处的虚页号，未知时为 -1
+  modified_pages: set[int]            # 自上次清空以来页表行被修改的虚页号
+  _last_page: int                     # 上次访问的虚页号
+  _last_line: Page | None             # 上次访问的页表行
+  _page_pool: list[Page]              # 已写回虚页留下的页表行，供之后装入的虚页复用
+  swap_out_hooks: list[Callable[[int], None]] # 写回虚页前以虚页号调用的回调，供快表先行写回脏位
   printer: Printer
+  _verbose: bool                      # 是否输出消息，由构造时的 printer 决定
+  _debug: bool                        # 是否在每次访问时检查参数
   
   def __init__(
     self,
     main_mem: SetAssocCache,
     size: int = 1 << 32,
     page_size: int = 2 << 10,
-    printer: Printer = print
+    printer: Printer = print,
+    debug: bool = False
   ):
     """
     :param main_mem: 主存
     :param size: 虚拟内存空间大小
     :param page_size: 页面大小
+    :param debug: 是否在每次访问时检查参数
     """
     assert size % page_size == 0, "虚拟内存空间大小必须是页面大小的整数倍"
+    assert page_size & (page_size - 1) == 0, "页面大小必须是 2 的幂"
     self.main_mem = main_mem
     self.size = size
     self.page_size = page_size
+    self._page_shift = page_size.bit_length() - 1
+    self._page_mask = page_size - 1
     self.page_table = dict()
-    self.frame_set = {i for i in range(self.main_mem.physical.size // self.page_size)}
-    self.lru_queue = deque()
+    self.resident_pages = []
+    nframes = self.main_mem.physical.size // self.page_size
+    self.free_frames = list(reversed(range(nframes))) # 使页框按编号从小到大分配
+    self.lru_list = LRUList(nframes, debug)
+    self._frame_page = [-1] * nframes
+    self._mru_page = -1
+    self.modified_pages = set()
+    self._last_page = -1
+    self._last_line = None
+    self._page_pool = []
+    self.swap_out_hooks = []
     self.printer = printer
+    self._verbose = not isinstance(printer, SilentPrinter)
+    self._debug = debug
 
   def randomize_page_table(self, mem_usage: float):
     """随机化页表。本函数必须在初始化后立即使用
     
+    将空闲页框随机分配给编号最小的若干未装入虚页，整个过程由批量操作完成。
+    
     :param mem_usage: 物理内存占用率
     """
     assert 0 <= mem_usage <= 1, "占用率必须在 [0, 1] 范围内"
-    for page, frame in enumerate(random.sample(
-      list(self.frame_set),
-      k=int(mem_usage * len(self.frame_set))
-    )):
-      line = self.page_table.setdefault(page, self.Page())
-      line.physical = frame
-      self.frame_set.remove(frame)
-      self.lru_queue.append(page)
+    pages = list(islice(
+      (page for page in range(self.size // self.page_size) if page not in self.page_table),
+      int(mem_usage * len(self.free_frames))
+    ))
+    if not pages:
+      return
+    frames = random.sample(self.free_frames, k=len(pages)) # 只抽取所需的页框
+    taken = bytearray(len(self._frame_page)) # 已分配页框的掩码
+    for frame in frames:
+      taken[frame] = True
+    self.free_frames = [frame for frame in self.free_frames if not taken[frame]] # 一次过滤，保持原有的分配顺序
+    self.page_table.update({page: self.Page(physical=frame) for page, frame in zip(pages, frames)})
+    self.resident_pages.extend(pages)
+    self.resident_pages.sort()
+    for page, frame in zip(pages, frames):
+      self._frame_page[frame] = page
+      self.lru_list.push(frame)
+    self._mru_page = pages[-1]
+    self.modified_pages.update(pages)
+  
+  def _lookup(self, page: int):
+    """查页表，虚页未装入时返回 None
+
+    连续的访问通常落在同一虚页，先检查上次访问的页表行，命中则无需查字典。
+    """
+    if page == self._last_page:
+      return self._last_line
+    line = self.page_table.get(page)
+    if line is not None:
+      self._last_page = page
+      self._last_line = line
+    return line
+
+  def translate(self, addr: int):
+    """将虚地址转换为实地址，虚页未装入时返回 None"""
+    line = self._lookup(addr >> self._page_shift)
+    if line is None:
+      return None
+    return (line.physical << self._page_shift) | (addr & self._page_mask)
   
   def _swap_in(self, page: int):
     """向主存装入一个虚页，若发生写回则返回被换出的虚页号"""
-    assert page >= 0 and page < self.size // self.page_size, "虚页号不可越界"
-    assert page not in self.page_table, "只有当虚页未装入时才能装入"
-    line = self.page_table.setdefault(page, self.Page())
+    if self._debug:
+      assert page >= 0 and page < self.size // self.page_size, "虚页号不可越界"
+      assert page not in self.page_table, "只有当虚页未装入时才能装入"
+    line = self._page_pool.pop() if self._page_pool else self.Page()
     line.dirty = False
+    self.page_table[page] = line
     swapped = None
     
     # LRU
-    if len(self.frame_set) == 0: # 若主存已满
-      self.printer("主存已满，需要写回一个页")
-      swapped = self.lru_queue[0]
-      self._swap_out(self.lru_queue[0]) # 将最久未访问过的页写回
+    if not self.free_frames: # 若主存已满
+      if self._verbose:
+        self.printer("主存已满，需要写回一个页")
+      swapped = self._frame_page[self.lru_list.oldest()]
+      self._swap_out(swapped) # 将最久未访问过的页写回
     
-    line.physical = self.frame_set.pop()
-    self.lru_queue.append(page)
-    self.printer(f"将虚页 {page:#x} 装入主存")
+    line.physical = self.free_frames.pop()
+    insort(self.resident_pages, page)
+    self._frame_page[line.physical] = page
+    self.lru_list.push(line.physical)
+    self._mru_page = page
+    self.modified_pages.add(page)
+    if self._verbose:
+      self.printer(f"将虚页 {page:#x} 装入主存")
     return swapped
   
   def _swap_out(self, page: int):
     """从主存写回一个虚页"""
-    assert page >= 0 and page < self.size // self.page_size, "虚页号不可越界"
-    assert page in self.page_table, "只有当虚页已装入时才能写回"
+    if self._debug:
+      assert page >= 0 and page < self.size // self.page_size, "虚页号不可越界"
+      assert page in self.page_table, "只有当虚页已装入时才能写回"
+    for hook in self.swap_out_hooks: # 须在判断脏位之前，让快表把尚未写回的脏位写回页表
+      hook(page)
     line = self.page_table[page]
-    self.printer("将虚页 {page:#x} 所对应的实页的所有 cache 全部作废")
+    if page == self._last_page:
+      self._last_page = -1
+      self._last_line = None
+    if page == self._mru_page:
+      self._mru_page = -1
+    if self._verbose:
+      self.printer(f"将虚页 {page:#x} 所对应的实页的所有 cache 全部作废")
     self.main_mem.invalidate( # 写回虚页前，必须确保主存的 cache 全部无效
       line.physical * self.page_size,
       (line.physical + 1) * self.page_size
     )
     if line.dirty:
-      self.printer(f"向辅存写回虚页 {page:#x}")
-    self.frame_set.add(line.physical)
-    self.lru_queue.remove(page)
-    del self.page_table[page]
+      if self._verbose:
+        self.printer(f"向辅存写回虚页 {page:#x}")
+    self.free_frames.append(line.physical)
+    self.lru_list.remove(line.physical)
+    del self.resident_pages[bisect_left(self.resident_pages, page)]
+    self._page_pool.append(self.page_table.pop(page))
+    self.modified_pages.add(page)
   
   def read(self, addr: int):
-    """读一个虚地址，返回是否在主存中"""
-    assert addr >= 0 and addr < self.size, "虚地址不可越界"
-    page = addr // self.page_size
-    page_addr = addr % self.page_size
-    if page in self.page_table: # 在主存中
-      self.printer("虚页在主存中")
-      self.lru_queue.remove(page)
-      self.lru_queue.append(page)
+    """读一个虚地址，若缺页时发生写回则返回被换出的虚页号"""
+    if self._debug:
+      assert 0 <= addr < self.size, "虚地址不可越界"
+    page = addr >> self._page_shift
+    page_addr = addr & self._page_mask
+    line = self._lookup(page)
+    swapped = None
+    if line is not None: # 在主存中
+      if self._verbose:
+        self.printer("虚页在主存中")
+      if page != self._mru_page: # 连续访问同一虚页时无需调整 LRU 链表
+        self.lru_list.touch(line.physical)
+        self._mru_page = page
     else: # 缺页
-      self.printer("缺页，从辅存中装入")
-      self._swap_in(page)
-    line = self.page_table[page]
-    phys_addr = line.physical * self.page_size + page_addr
+      if self._verbose:
+        self.printer("缺页，从辅存中装入")
+      swapped = self._swap_in(page)
+      line = self._lookup(page)
+    phys_addr = (line.physical << self._page_shift) | page_addr
     self.main_mem.read(phys_addr)
+    return swapped
 
   def write(self, addr: int):
-    """写一个虚地址，返回是否在主存中"""
-    assert addr >= 0 and addr < self.size, "虚地址不可越界"
-    page = addr // self.page_size
-    page_addr = addr % self.page_size
-    if page in self.page_table: # 在主存中
-      self.printer("虚页在主存中")
-      self.lru_queue.remove(page)
-      self.lru_queue.append(page)
+    """写一个虚地址，若缺页时发生写回则返回被换出的虚页号"""
+    if self._debug:
+      assert 0 <= addr < self.size, "虚地址不可越界"
+    page = addr >> self._page_shift
+    page_addr = addr & self._page_mask
+    line = self._lookup(page)
+    swapped = None
+    if line is not None: # 在主存中
+      if self._verbose:
+        self.printer("虚页在主存中")
+      if page != self._mru_page: # 连续访问同一虚页时无需调整 LRU 链表
+        self.lru_list.touch(line.physical)
+        self._mru_page = page
     else: # 缺页
-      self.printer("缺页，从辅存中装入")
-      self._swap_in(page)
-    line = self.page_table[page]
-    phys_addr = line.physical * self.page_size + page_addr
+      if self._verbose:
+        self.printer("缺页，从辅存中装入")
+      swapped = self._swap_in(page)
+      line = self._lookup(page)
+    phys_addr = (line.physical << self._page_shift) | page_addr
     self.main_mem.write(phys_addr)
-    line.dirty = True
+    if not line.dirty:
+      line.dirty = True
+      self.modified_pages.add(page)
+    return swapped
 
 class FullyAssocTLB:
   """全相联快表"""
   
-  @dataclass
+  @dataclass(slots=True)
   class Line:
     """快表中的一行
 
@@ -342,39 +636,66 @@ class FullyAssocTLB:
   
   virtual_mem: VirtualMemory # 主页表
   table: list[Line] # 快表数据
-  lru_queue: deque[int] # LRU 算法的队列
+  lru_list: LRUList # LRU 算法的链表
+  _rows: dict[int, int] # 有效行的虚页号 -> 行号
+  _mru_idx: int # 处于 LRU 链表最近访问处的行号，未知时为 -1
+  modified_lines: set[int] # 自上次清空以来内容被修改的行号
   printer: Printer
+  _verbose: bool # 是否输出消息，由构造时的 printer 决定
+  _debug: bool # 是否在每次访问时检查参数
   
   def __init__(
     self,
     virtual_mem: VirtualMemory,
     size: int = 32,
-    printer: Printer = print
+    printer: Printer = print,
+    debug: bool = False
   ):
     """
     :param virtual_mem: 主页表
     :param size: 容量
+    :param debug: 是否在每次访问时检查参数
     """
     self.virtual_mem = virtual_mem
     self.table = [self.Line() for _ in range(size)]
-    self.lru_queue = deque()
+    self.lru_list = LRUList(size, debug)
+    self._rows = dict()
+    self._mru_idx = -1
+    self.modified_lines = set()
     self.printer = printer
+    self._verbose = not isinstance(printer, SilentPrinter)
+    self._debug = debug
+    virtual_mem.swap_out_hooks.append(self._invalidate_swapped)
+
+  def _lookup(self, page: int):
+    """查找虚页所在的行号，不在快表中则返回 None"""
+    return self._rows.get(page)
+
+  def _invalidate_swapped(self, swapped: int):
+    """虚拟内存即将写回虚页 swapped 时，将 TLB 中的对应行换出
+
+    换出时 TLB 中被修改的脏位先写回页表，虚拟内存随后据此决定是否向辅存写回。
+    """
+    if self._verbose:
+      self.printer("虚拟内存发生写回，将 TLB 中的对应行无效化")
+    swapped_idx = self._rows.get(swapped)
+    if swapped_idx is not None:
+      self._swap_out(swapped_idx)
 
   def _swap_in(self, page: int):
     """换入一行，返回换入的行号"""
-    assert page >= 0 and page < self.virtual_mem.size // self.virtual_mem.page_size, "虚页号不可越界"
-    idx = next((i for i, line in enumerate(self.table) if not line.valid), None)
+    if self._debug:
+      assert page >= 0 and page < self.virtual_mem.size // self.virtual_mem.page_size, "虚页号不可越界"
+    idx = None
+    if len(self._rows) < len(self.table): # 快表未满时才有空闲行
+      idx = next(i for i, line in enumerate(self.table) if not line.valid)
     if idx is None:
-      self.printer("TLB 已满，需要换出一行")
-      idx = self.lru_queue[0]
+      if self._verbose:
+        self.printer("TLB 已满，需要换出一行")
+      idx = self.lru_list.oldest()
       self._swap_out(idx) # 将最久未访问的行写回
     if page not in self.virtual_mem.page_table:
-      swapped = self.virtual_mem._swap_in(page)
-      if swapped is not None:
-        self.printer("虚拟内存发生写回，将 TLB 中的对应行无效化")
-        swapped_idx = next((i for i, line in enumerate(self.table) if line.virtual == swapped), None)
-        if swapped_idx is not None:
-          self._swap_out(swapped_idx)
+      self.virtual_mem._swap_in(page)
     source_line = self.virtual_mem.page_table[page]
     line = self.table[idx]
     line.valid = True
@@ -382,7 +703,12 @@ class FullyAssocTLB:
     line.dirty_dirty = False
     line.virtual = page
     line.physical = source_line.physical
-    self.printer(f"将虚页 {page:#x} 的页表行读取到 TLB")
+    self._rows[page] = idx
+    self.lru_list.push(idx)
+    self._mru_idx = idx
+    self.modified_lines.add(idx)
+    if self._verbose:
+      self.printer(f"将虚页 {page:#x} 的页表行读取到 TLB")
     return idx
   
   def _swap_out(self, idx: int):
@@ -390,43 +716,109 @@ class FullyAssocTLB:
     
     :param idx: 行号
     """
-    assert 0 <= idx < len(self.table), "行号不可越界"
-    if self.table[idx].dirty_dirty:
-      self.printer("TLB 脏位被修改，需要写回页表")
+    if self._debug:
+      assert 0 <= idx < len(self.table), "行号不可越界"
+    if self.table[idx].dirty_dirty: # 虚页被写回前会先换出本行，因此页表行必然存在
+      if self._verbose:
+        self.printer("TLB 脏位被修改，需要写回页表")
       self.virtual_mem.page_table[self.table[idx].virtual].dirty = True
+      self.virtual_mem.modified_pages.add(self.table[idx].virtual)
     self.table[idx].valid = False
-    self.lru_queue.remove(idx)
-    self.printer(f"令虚页 {self.table[idx].virtual:#x} 在 TLB 中的对应行失效")
+    del self._rows[self.table[idx].virtual]
+    self.modified_lines.add(idx)
+    self.lru_list.remove(idx)
+    if idx == self._mru_idx:
+      self._mru_idx = -1
+    if self._verbose:
+      self.printer(f"令虚页 {self.table[idx].virtual:#x} 在 TLB 中的对应行失效")
   
   def read(self, addr: int):
     """读一个虚地址"""
-    assert addr >= 0 and addr < self.virtual_mem.size, "虚地址不可越界"
-    page = addr // self.virtual_mem.page_size
-    page_addr = addr % self.virtual_mem.page_size
-    idx = next((i for i, line in enumerate(self.table) if line.valid and line.virtual == page), None)
+    if self._debug:
+      assert 0 <= addr < self.virtual_mem.size, "虚地址不可越界"
+    page = addr >> self.virtual_mem._page_shift
+    page_addr = addr & self.virtual_mem._page_mask
+    idx = self._lookup(page)
     if idx is not None:
       line = self.table[idx]
-      self.printer("虚页在 TLB 中，直接访问内存")
-      self.virtual_mem.main_mem.read(line.physical * self.virtual_mem.page_size + page_addr)
+      if idx != self._mru_idx: # 连续访问同一行时无需调整 LRU 链表
+        self.lru_list.touch(idx)
+        self._mru_idx = idx
+      if self._verbose:
+        self.printer("虚页在 TLB 中，直接访问内存")
+      self.virtual_mem.main_mem.read((line.physical << self.virtual_mem._page_shift) | page_addr)
     else:
-      self.printer("虚页不在 TLB 中，需要查页表，并将页表行存入 TLB")
+      if self._verbose:
+        self.printer("虚页不在 TLB 中，需要查页表，并将页表行存入 TLB")
       self.virtual_mem.read(addr)
       self._swap_in(page)
     
   def write(self, addr: int):
     """写一个虚地址"""
-    assert addr >= 0 and addr < self.virtual_mem.size, "虚地址不可越界"
-    page = addr // self.virtual_mem.page_size
-    page_addr = addr % self.virtual_mem.page_size
-    idx = next((i for i, line in enumerate(self.table) if line.valid and line.virtual == page), None)
+    if self._debug:
+      assert 0 <= addr < self.virtual_mem.size, "虚地址不可越界"
+    page = addr >> self.virtual_mem._page_shift
+    page_addr = addr & self.virtual_mem._page_mask
+    idx = self._lookup(page)
     if idx is not None:
       line = self.table[idx]
-      self.printer("虚页在 TLB 中，直接访问内存")
-      self.virtual_mem.main_mem.write(line.physical * self.virtual_mem.page_size + page_addr)
+      if idx != self._mru_idx: # 连续访问同一行时无需调整 LRU 链表
+        self.lru_list.touch(idx)
+        self._mru_idx = idx
+      if self._verbose:
+        self.printer("虚页在 TLB 中，直接访问内存")
+      self.virtual_mem.main_mem.write((line.physical << self.virtual_mem._page_shift) | page_addr)
       if not (line.dirty or line.dirty_dirty):
         line.dirty = True
         line.dirty_dirty = True
+        self.modified_lines.add(idx)
     else:
-      self.printer("虚页不在 TLB 中，需要查页表，并将页表行存入 TLB")
+      if self._verbose:
+        self.printer("虚页不在 TLB 中，需要查页表，并将页表行存入 TLB")
       self.virtual_mem.write(addr)
       self._swap_in(page)
+
+  def run(self, addrs: Iterable[int], is_write: Iterable[bool]):
+    """依次读写一组虚地址，用于批量回放访问序列，返回快表命中次数
+
+    不输出消息时，连续命中快表的访问只更新快表，所得实地址攒在一起，
+    到下一次不命中之前（或序列结束时）再一次性交给主存的 run。
+    需要输出消息时则逐次调用 read 与 write，以保持消息的先后顺序。
+
+    :param addrs: 虚地址序列
+    :param is_write: 与 addrs 一一对应，表示各次访问是否为写
+    """
+    hits = 0
+    if self._verbose:
+      for addr, write in zip(addrs, is_write):
+        hits += self._lookup(addr >> self.virtual_mem._page_shift) is not None
+        (self.write if write else self.read)(addr)
+      return hits
+    main_mem = self.virtual_mem.main_mem
+    (page_shift, page_mask) = (self.virtual_mem._page_shift, self.virtual_mem._page_mask)
+    (rows, table) = (self._rows, self.table)
+    pending_addrs = list[int]() # 尚未交给主存的实地址
+    pending_writes = list[bool]()
+    for addr, write in zip(addrs, is_write):
+      if self._debug:
+        assert 0 <= addr < self.virtual_mem.size, "虚地址不可越界"
+      idx = rows.get(addr >> page_shift)
+      if idx is None: # 不命中，先让主存完成之前的访问，再走完整的访问流程
+        main_mem.run(pending_addrs, pending_writes)
+        pending_addrs.clear()
+        pending_writes.clear()
+        (self.write if write else self.read)(addr)
+        continue
+      hits += 1
+      line = table[idx]
+      if idx != self._mru_idx:
+        self.lru_list.touch(idx)
+        self._mru_idx = idx
+      if write and not (line.dirty or line.dirty_dirty):
+        line.dirty = True
+        line.dirty_dirty = True
+        self.modified_lines.add(idx)
+      pending_addrs.append((line.physical << page_shift) | (addr & page_mask))
+      pending_writes.append(write)
+    main_mem.run(pending_addrs, pending_writes)
+    return hits